@@ -1,24 +1,118 @@
 """Chat endpoints"""
-from fastapi import APIRouter, HTTPException
-from typing import Optional
+from fastapi import APIRouter, HTTPException, Depends
+from fastapi.responses import StreamingResponse
+from typing import Optional, List, Dict, Any, Tuple
+import asyncio
+import logging
 import uuid
+import orjson
+from cachetools import TTLCache
 
 from app.models.schemas import ChatRequest, ChatResponse
-from app.services.ai_service import AIService
+from app.services.ai_service import AIService, EMPTY_QUERY_RESPONSE
 from app.services.vector_service import VectorService
+from app.services.answer_cache import AnswerCache
+from app.core.config import get_settings
+from app.core.database import DocumentDatabase
+from app.core.services import get_ai_service, get_vector_service, get_database
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
-# Initialize services
-ai_service = AIService()
-vector_service = VectorService()
+settings = get_settings()
+
+# Answers to recently asked questions, reused when the same question is asked again
+answer_cache = AnswerCache(
+    ttl=settings.ANSWER_CACHE_TTL,
+    max_entries=settings.ANSWER_CACHE_MAX_ENTRIES
+)
+
+# Caps how many chat requests run retrieval and generation at once
+chat_semaphore = asyncio.Semaphore(settings.CHAT_MAX_CONCURRENCY)
+
+# In-memory conversation storage (replace with database in production).
+# Bounded in size, and idle conversations expire.
+conversations = TTLCache(maxsize=settings.CONVERSATION_MAX_COUNT, ttl=settings.CONVERSATION_TTL)
+
+
+async def _retrieve_context(
+    message: str,
+    document_ids: Optional[List[str]],
+    vector_service: VectorService,
+    db: DocumentDatabase
+) -> Tuple[List[str], List[str]]:
+    """Search the selected documents for chunks relevant to the message"""
+    context_chunks = []
+    sources = []
+    
+    if not document_ids:
+        return context_chunks, sources
+    
+    logger.debug("RAG: searching across IDs: %s", document_ids)
+    try:
+        search_results = await vector_service.search_similar(
+            query=message,
+            top_k=7, 
+            document_ids=document_ids
+        )
+
+        logger.debug("Vector results found: %d", len(search_results))
+        if search_results:
+            context_chunks = [result["text"] for result in search_results if result.get("text")]
+            sources = [f"{result['metadata'].get('filename', 'Doc')}: Chunk {result['metadata'].get('chunk_index', '?')}" for result in search_results]
+
+        # IMPROVED FALLBACK: If vector search returns nothing (common for broad queries like 'summarize'),
+        # use the summary precomputed at upload time for each document.
+        unsummarized_ids = []
+        if not context_chunks:
+            logger.debug("Vector search yielded 0 chunks for %r. Using document summaries.", message)
+            summaries = db.get_summaries(document_ids)
+            for doc in summaries:
+                context_chunks.append(doc["summary"])
+                sources.append(f"{doc['filename']}: Summary")
+            
+            summarized_ids = {doc["document_id"] for doc in summaries}
+            unsummarized_ids = [doc_id for doc_id in document_ids if doc_id not in summarized_ids]
+        
+        # BROAD FALLBACK: for documents without a summary, force-retrieve the first few chunks.
+        if unsummarized_ids:
+            logger.debug("No summary for %d document(s). Triggering broad fallback.", len(unsummarized_ids))
+            # Query every document concurrently.
+            # Use a word that passes the stopword filter to trigger broad retrieval
+            fallback_batches = await asyncio.gather(*[
+                vector_service.search_similar(
+                    query="pdf", 
+                    top_k=3, # Get top 3 chunks per doc
+                    document_ids=[doc_id]
+                )
+                for doc_id in unsummarized_ids
+            ], return_exceptions=True)
+            for doc_id, fallback_results in zip(unsummarized_ids, fallback_batches):
+                if isinstance(fallback_results, Exception):
+                    logger.warning("Fallback failed for doc %s: %s", doc_id, fallback_results)
+                    continue
+                if fallback_results:
+                    context_chunks.extend([res["text"] for res in fallback_results if res.get("text")])
+                    sources.extend([f"{res['metadata'].get('filename', 'Doc')}: Chunk {res['metadata'].get('chunk_index', '?')} (Full Doc)" for res in fallback_results])
 
-# In-memory conversation storage (replace with database in production)
-conversations = {}
+        if context_chunks:
+            logger.debug("RAG success: %d chunks retrieved.", len(context_chunks))
+        else:
+            logger.debug("RAG failure: no context found even after broad fallback.")
+    except Exception as search_error:
+        logger.warning("Error during vector search: %s", search_error)
+    
+    return context_chunks, sources
 
 
 @router.post("", response_model=ChatResponse)
-async def chat(request: ChatRequest):
+async def chat(
+    request: ChatRequest,
+    ai_service: AIService = Depends(get_ai_service),
+    vector_service: VectorService = Depends(get_vector_service),
+    db: DocumentDatabase = Depends(get_database)
+):
     """
     Send a chat message and get AI response with RAG context.
     """
@@ -26,66 +120,64 @@ async def chat(request: ChatRequest):
         # Get or create conversation ID
         conversation_id = request.conversation_id or str(uuid.uuid4())
         
+        # Blank input skips retrieval and the model entirely
+        if not request.message.strip():
+            return ChatResponse(response=EMPTY_QUERY_RESPONSE, conversation_id=conversation_id)
+        
         # Get conversation history
         history = conversations.get(conversation_id, [])
         
-        # Search for relevant context if document_ids provided
-        context_chunks = []
-        sources = []
+        # Fresh questions can be answered from the answer cache. Follow-ups
+        # depend on the conversation so far and always go to the model.
+        cache_key = AnswerCache.make_key(request.document_ids)
+        new_question = not history
+        if new_question:
+            cached = answer_cache.get(cache_key, request.message)
+            if cached:
+                logger.debug("Answer cache hit for %r", request.message)
+                history.append({"role": "user", "content": request.message})
+                history.append({"role": "assistant", "content": cached["response"]})
+                conversations[conversation_id] = history[-10:]
+                
+                return ChatResponse(
+                    response=cached["response"],
+                    conversation_id=conversation_id,
+                    sources=cached["sources"]
+                )
         
-        if request.document_ids:
-            print(f"🔍 RAG: Searching across IDs: {request.document_ids}")
+        async with chat_semaphore:
+            # Search for relevant context if document_ids provided
+            context_chunks, sources = await _retrieve_context(
+                request.message, request.document_ids, vector_service, db
+            )
+            
+            # Generate AI response. When enabled, a new conversation also gets
+            # a title, generated alongside the response so it adds no latency.
+            logger.debug("Generating AI response for user query")
+            title = None
             try:
-                search_results = await vector_service.search_similar(
+                response_coro = ai_service.generate_response(
                     query=request.message,
-                    top_k=7, 
-                    document_ids=request.document_ids
+                    context=context_chunks,
+                    conversation_history=history,
+                    document_id=request.document_ids[0] if request.document_ids else None
                 )
-                
-                print(f"📊 Vector results found: {len(search_results)}")
-                if search_results:
-                    context_chunks = [result["text"] for result in search_results if result.get("text")]
-                    sources = [f"{result['metadata'].get('filename', 'Doc')}: Chunk {result['metadata'].get('chunk_index', '?')}" for result in search_results]
-                
-                # IMPROVED FALLBACK: If vector search returns nothing (common for broad queries like 'summarize'),
-                # and we HAVE document IDs, force-retrieve the first few chunks of each document.
-                if not context_chunks:
-                    print(f"⚠️ Vector search yielded 0 chunks for '{request.message}'. Triggering BROAD FALLBACK.")
-                    for doc_id in request.document_ids:
-                        try:
-                            # Use a word that passes the stopword filter to trigger broad retrieval
-                            fallback_results = await vector_service.search_similar(
-                                query="pdf", 
-                                top_k=3, # Get top 3 chunks per doc
-                                document_ids=[doc_id]
-                            )
-                            if fallback_results:
-                                context_chunks.extend([res["text"] for res in fallback_results if res.get("text")])
-                                sources.extend([f"{res['metadata'].get('filename', 'Doc')}: Chunk {res['metadata'].get('chunk_index', '?')} (Full Doc)" for res in fallback_results])
-                        except Exception as e:
-                            print(f"❌ Fallback failed for doc {doc_id}: {e}")
-
-                if context_chunks:
-                    print(f"✅ RAG SUCCESS: {len(context_chunks)} chunks retrieved.")
+                if history or not settings.CHAT_GENERATE_TITLES:
+                    response_text = await response_coro
                 else:
-                    print("⚠️ RAG FAILURE: No context found even after broad fallback.")
-            except Exception as search_error:
-                print(f"⚠️ Error during vector search: {str(search_error)}")
-        
-        # Generate AI response
-        print(f"🤖 Generating AI response for user query...")
-        try:
-            response_text = await ai_service.generate_response(
-                query=request.message,
-                context=context_chunks,
-                conversation_history=history,
-                document_id=request.document_ids[0] if request.document_ids else None
-            )
-            print(f"✅ AI response generated successfully ({len(response_text)} chars)")
-        except Exception as ai_err:
-            print(f"❌ AI Generation Error: {str(ai_err)}")
-            # Return error message to user instead of 500
-            response_text = f"I'm sorry, I encountered an error while communicating with the AI service: {str(ai_err)}"
+                    response_text, title = await asyncio.gather(
+                        response_coro, ai_service.generate_title(request.message)
+                    )
+                logger.debug("AI response generated (%d chars)", len(response_text))
+            
+                # Only cache answers grounded in retrieved context; an empty
+                # retrieval may just mean the vector store was unreachable
+                if new_question and context_chunks and response_text.strip():
+                    answer_cache.put(cache_key, request.message, response_text, sources)
+            except Exception as ai_err:
+                logger.error("AI generation error: %s", ai_err)
+                # Return error message to user instead of 500
+                response_text = f"I'm sorry, I encountered an error while communicating with the AI service: {str(ai_err)}"
         
         # Update conversation history
         history.append({"role": "user", "content": request.message})
@@ -95,25 +187,137 @@ async def chat(request: ChatRequest):
         return ChatResponse(
             response=response_text,
             conversation_id=conversation_id,
-            sources=sources
+            sources=sources,
+            title=title
         )
         
     except Exception as e:
-        print(f"❌ Top-level Chat End-point Error: {str(e)}")
+        logger.exception("Top-level chat endpoint error")
         raise HTTPException(status_code=500, detail=f"Critical chat error: {str(e)}")
 
 
+def _format_sse(data: Dict[str, Any], event: Optional[str] = None) -> str:
+    """Encode one server-sent event"""
+    payload = orjson.dumps(data).decode()
+    if event:
+        return f"event: {event}\ndata: {payload}\n\n"
+    return f"data: {payload}\n\n"
+
+
+@router.post("/stream")
+async def chat_stream(
+    request: ChatRequest,
+    ai_service: AIService = Depends(get_ai_service),
+    vector_service: VectorService = Depends(get_vector_service),
+    db: DocumentDatabase = Depends(get_database)
+):
+    """
+    Send a chat message and stream the AI response as server-sent events.
+    
+    Emits a `meta` event with the conversation ID and sources, one unnamed
+    event per generated text chunk (`{"text": ...}`), and a final `done`
+    event. When CHAT_GENERATE_TITLES is set, the `done` event for the first
+    message of a conversation also carries a generated `title`. A provider
+    failure is reported as an `error` event.
+    """
+    conversation_id = request.conversation_id or str(uuid.uuid4())
+    
+    # Blank input skips retrieval and the model entirely
+    if not request.message.strip():
+        async def empty_stream():
+            yield _format_sse({"conversation_id": conversation_id, "sources": []}, event="meta")
+            yield _format_sse({"text": EMPTY_QUERY_RESPONSE})
+            yield _format_sse({"conversation_id": conversation_id}, event="done")
+        
+        return StreamingResponse(
+            empty_stream(),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
+    
+    history = conversations.get(conversation_id, [])
+    
+    cache_key = AnswerCache.make_key(request.document_ids)
+    new_question = not history
+    cached = None
+    if new_question:
+        cached = answer_cache.get(cache_key, request.message)
+    
+    async def event_stream():
+        if cached:
+            logger.debug("Answer cache hit for %r", request.message)
+            yield _format_sse({"conversation_id": conversation_id, "sources": cached["sources"]}, event="meta")
+            yield _format_sse({"text": cached["response"]})
+            
+            history.append({"role": "user", "content": request.message})
+            history.append({"role": "assistant", "content": cached["response"]})
+            conversations[conversation_id] = history[-10:]
+            
+            yield _format_sse({"conversation_id": conversation_id}, event="done")
+            return
+        
+        # Title a new conversation while its first answer streams
+        title_task = None
+        if not history and settings.CHAT_GENERATE_TITLES:
+            title_task = asyncio.create_task(ai_service.generate_title(request.message))
+        
+        async with chat_semaphore:
+            context_chunks, sources = await _retrieve_context(
+                request.message, request.document_ids, vector_service, db
+            )
+            yield _format_sse({"conversation_id": conversation_id, "sources": sources}, event="meta")
+            
+            response_parts = []
+            try:
+                async for text in ai_service.stream_response(
+                    query=request.message,
+                    context=context_chunks,
+                    conversation_history=history,
+                    document_id=request.document_ids[0] if request.document_ids else None
+                ):
+                    response_parts.append(text)
+                    yield _format_sse({"text": text})
+                response_text = "".join(response_parts)
+                
+                # Same rule as POST /chat: only cache non-empty answers grounded
+                # in retrieved context. A stream where every chunk was empty
+                # (e.g. a safety block) must not be served to later questions.
+                if new_question and context_chunks and response_text.strip():
+                    answer_cache.put(cache_key, request.message, response_text, sources)
+            except Exception as ai_err:
+                logger.error("AI streaming error: %s", ai_err)
+                response_text = f"I'm sorry, I encountered an error while communicating with the AI service: {str(ai_err)}"
+                yield _format_sse({"detail": response_text}, event="error")
+        
+        # Update conversation history once the full response is known
+        history.append({"role": "user", "content": request.message})
+        history.append({"role": "assistant", "content": response_text})
+        conversations[conversation_id] = history[-10:]  # Keep last 10 messages
+        
+        done = {"conversation_id": conversation_id}
+        if title_task is not None:
+            done["title"] = await title_task
+        yield _format_sse(done, event="done")
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @router.get("/conversations/{conversation_id}")
 async def get_conversation(conversation_id: str):
     """
     Get conversation history.
     """
-    if conversation_id not in conversations:
+    messages = conversations.get(conversation_id)
+    if messages is None:
         raise HTTPException(status_code=404, detail="Conversation not found")
     
     return {
         "conversation_id": conversation_id,
-        "messages": conversations[conversation_id]
+        "messages": messages
     }
 
 
@@ -122,8 +326,7 @@ async def delete_conversation(conversation_id: str):
     """
     Delete a conversation.
     """
-    if conversation_id not in conversations:
+    if conversations.pop(conversation_id, None) is None:
         raise HTTPException(status_code=404, detail="Conversation not found")
     
-    del conversations[conversation_id]
     return {"message": "Conversation deleted", "conversation_id": conversation_id}
@@ -1,27 +1,37 @@
 """Document management endpoints"""
-from fastapi import APIRouter, File, UploadFile, HTTPException, Depends
+from fastapi import APIRouter, File, UploadFile, HTTPException, Depends, Request, Response
 from typing import List
+import asyncio
+import hashlib
 import os
 import uuid
 from datetime import datetime
 
 from app.models.schemas import DocumentUploadResponse, DocumentInfo, SearchRequest
-from app.services.document_service import DocumentService
+from app.services.document_service import DocumentService, FileTooLargeError
 from app.services.vector_service import VectorService
+from app.services.ai_service import AIService
 from app.core.database import DocumentDatabase
+from app.core.config import get_settings
+from app.core.services import get_ai_service, get_vector_service, get_document_service, get_database
 
 router = APIRouter()
 
-# Initialize services
-document_service = DocumentService()
-vector_service = VectorService()
+settings = get_settings()
 
-# Initialize persistent database
-db = DocumentDatabase()
+# Clients may store document reads but must revalidate each time, so uploads
+# and deletes show up immediately; the ETag keeps unchanged reads to a 304
+READ_CACHE_CONTROL = "private, no-cache"
 
 
 @router.post("/upload", response_model=DocumentUploadResponse)
-async def upload_document(file: UploadFile = File(...)):
+async def upload_document(
+    file: UploadFile = File(...),
+    document_service: DocumentService = Depends(get_document_service),
+    vector_service: VectorService = Depends(get_vector_service),
+    ai_service: AIService = Depends(get_ai_service),
+    db: DocumentDatabase = Depends(get_database)
+):
     """
     Upload a PDF document and process it for RAG.
     """
@@ -39,12 +49,13 @@ async def upload_document(file: UploadFile = File(...)):
     
     try:
         # Save file
-        with open(file_path, "wb") as f:
-            content = await file.read()
-            f.write(content)
+        try:
+            await document_service.save_upload(file, file_path)
+        except FileTooLargeError as size_err:
+            raise HTTPException(status_code=413, detail=str(size_err))
         
         # Extract text from PDF
-        text_content = document_service.extract_text_from_pdf(file_path)
+        text_content = await document_service.extract_text_from_pdf(file_path)
         
         if not text_content:
             raise HTTPException(status_code=400, detail="Could not extract text from PDF")
@@ -64,8 +75,13 @@ async def upload_document(file: UploadFile = File(...)):
             for i, chunk in enumerate(chunks)
         ]
         
-        # Add to vector database
-        success = await vector_service.add_documents(chunks, metadata_list)
+        # Add to vector database (all chunks in one call so they are upserted in batches)
+        # while summarizing the document, which chat falls back to when retrieval
+        # finds nothing relevant
+        success, summary = await asyncio.gather(
+            vector_service.add_documents(chunks, metadata_list),
+            ai_service.summarize_document(text_content[:settings.SUMMARY_INPUT_CHARS])
+        )
         
         if not success:
             raise HTTPException(status_code=500, detail="Failed to add documents to vector database")
@@ -77,7 +93,8 @@ async def upload_document(file: UploadFile = File(...)):
             "upload_date": datetime.now().isoformat(),
             "chunks_count": len(chunks),
             "status": "processed",
-            "file_path": file_path
+            "file_path": file_path,
+            "summary": summary
         }
         
         db_success = db.add_document(document_info)
@@ -101,6 +118,11 @@ async def upload_document(file: UploadFile = File(...)):
             status="processed"
         )
         
+    except HTTPException:
+        # Clean up file on error, keeping the original status code
+        if os.path.exists(file_path):
+            os.remove(file_path)
+        raise
     except Exception as e:
         # Clean up file on error
         if os.path.exists(file_path):
@@ -108,16 +130,48 @@ async def upload_document(file: UploadFile = File(...)):
         raise HTTPException(status_code=500, detail=f"Error processing document: {str(e)}")
 
 
+def _etag_matches(request: Request, etag: str) -> bool:
+    """Check the request's If-None-Match header against an ETag (weak comparison)"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    
+    def opaque(tag: str) -> str:
+        tag = tag.strip()
+        return tag[2:] if tag.startswith("W/") else tag
+    
+    candidates = {opaque(tag) for tag in header.split(",")}
+    return "*" in candidates or opaque(etag) in candidates
+
+
 @router.get("", response_model=List[DocumentInfo])
-async def get_documents():
+async def get_documents(
+    request: Request,
+    response: Response,
+    db: DocumentDatabase = Depends(get_database)
+):
     """
     Get list of all uploaded documents.
     """
+    # The list only changes when documents are added or removed, so its
+    # version is the document count plus the latest upload date.
+    count, latest_upload = db.get_documents_version()
+    etag = 'W/"' + hashlib.sha1(f"{count}:{latest_upload}".encode()).hexdigest() + '"'
+    if _etag_matches(request, etag):
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": READ_CACHE_CONTROL})
+    
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = READ_CACHE_CONTROL
     return db.get_all_documents()
 
 
 @router.get("/{document_id}", response_model=DocumentInfo)
-async def get_document(document_id: str):
+async def get_document(
+    document_id: str,
+    request: Request,
+    response: Response,
+    db: DocumentDatabase = Depends(get_database)
+):
     """
     Get information about a specific document.
     """
@@ -125,11 +179,22 @@ async def get_document(document_id: str):
     if not document:
         raise HTTPException(status_code=404, detail="Document not found")
     
+    # Document records never change once stored
+    etag = f'"{document_id}:{document["upload_date"]}"'
+    if _etag_matches(request, etag):
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": READ_CACHE_CONTROL})
+    
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = READ_CACHE_CONTROL
     return document
 
 
 @router.delete("/{document_id}")
-async def delete_document(document_id: str):
+async def delete_document(
+    document_id: str,
+    vector_service: VectorService = Depends(get_vector_service),
+    db: DocumentDatabase = Depends(get_database)
+):
     """
     Delete a document and its associated vectors.
     """
@@ -178,7 +243,10 @@ async def delete_document(document_id: str):
 
 
 @router.post("/search")
-async def search_documents(request: SearchRequest):
+async def search_documents(
+    request: SearchRequest,
+    vector_service: VectorService = Depends(get_vector_service)
+):
     """
     Search for relevant document chunks.
     """
@@ -190,7 +258,7 @@ async def search_documents(request: SearchRequest):
         )
         
         return {
-            "query": query,
+            "query": request.query,
             "results": results,
             "total_results": len(results)
         }
@@ -15,16 +15,29 @@ class Settings(BaseSettings):
     PINECONE_ENVIRONMENT: str = ""
     PINECONE_INDEX_NAME: str = "rag-pdf-chatbot"
     PINECONE_HOST: str = ""  # Optional: for direct connection
+    PINECONE_UPSERT_CONCURRENCY: int = 8  # Upsert batches in flight at once
     
     # App Settings
     UPLOAD_DIR: str = "./uploads"
+    CACHE_DIR: str = "./cache"  # On-disk cache of chunk sparse vectors
     MAX_FILE_SIZE: int = 10485760  # 10MB
     CORS_ORIGINS: List[str] = ["http://localhost:3000"]
+    LOG_LEVEL: str = "INFO"
+    CHAT_MAX_CONCURRENCY: int = 16  # Chat requests allowed in retrieval/generation at once
+    CHAT_GENERATE_TITLES: bool = False  # Title new conversations (one extra model call each)
+    CONVERSATION_MAX_COUNT: int = 10000  # Conversations kept in memory
+    CONVERSATION_TTL: int = 3600  # Seconds before an idle conversation is dropped
     
     # Model Settings
     EMBEDDING_MODEL: str = "sentence-transformers/all-MiniLM-L6-v2"
     CHUNK_SIZE: int = 1000
-    CHUNK_OVERLAP: int = 200
+    CHUNK_OVERLAP: int = 200  # Characters repeated between chunks, capped at half of CHUNK_SIZE
+    SUMMARY_INPUT_CHARS: int = 8000  # Leading document text sent for the upload-time summary
+    MAX_CONTEXT_CHARS: int = 24000  # Retrieved context included in a chat prompt
+    
+    # Answer Cache Settings
+    ANSWER_CACHE_TTL: int = 3600  # Seconds
+    ANSWER_CACHE_MAX_ENTRIES: int = 1000
 
 @lru_cache()
 def get_settings():
@@ -1,57 +1,71 @@
 """SQLite database for persistent document storage"""
 import sqlite3
+import threading
 import json
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime
 import os
 
 
 class DocumentDatabase:
-    """Simple SQLite database for document metadata"""
+    """Simple SQLite database for document metadata.
+
+    A single long-lived connection in WAL mode is shared by every call, so
+    reads no longer pay for opening and closing the database file. Writes are
+    serialized with a lock.
+    """
     
     def __init__(self, db_path: str = "documents.db"):
         self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA temp_store=MEMORY")
+        self._conn.execute("PRAGMA mmap_size=268435456")
         self.init_db()
     
     def init_db(self):
         """Initialize database and create tables if they don't exist"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS documents (
-                document_id TEXT PRIMARY KEY,
-                filename TEXT NOT NULL,
-                upload_date TEXT NOT NULL,
-                chunks_count INTEGER NOT NULL,
-                status TEXT NOT NULL,
-                file_path TEXT NOT NULL
+        with self._lock:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS documents (
+                    document_id TEXT PRIMARY KEY,
+                    filename TEXT NOT NULL,
+                    upload_date TEXT NOT NULL,
+                    chunks_count INTEGER NOT NULL,
+                    status TEXT NOT NULL,
+                    file_path TEXT NOT NULL,
+                    summary TEXT
+                )
+            """)
+            
+            # Databases created before summaries were stored lack the column
+            columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(documents)")}
+            if "summary" not in columns:
+                self._conn.execute("ALTER TABLE documents ADD COLUMN summary TEXT")
+            
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_upload_date ON documents(upload_date)"
             )
-        """)
-        
-        conn.commit()
-        conn.close()
     
     def add_document(self, document_info: Dict[str, Any]) -> bool:
         """Add a document to the database"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute("""
-                INSERT INTO documents (document_id, filename, upload_date, chunks_count, status, file_path)
-                VALUES (?, ?, ?, ?, ?, ?)
-            """, (
-                document_info["document_id"],
-                document_info["filename"],
-                document_info["upload_date"],
-                document_info["chunks_count"],
-                document_info["status"],
-                document_info["file_path"]
-            ))
-            
-            conn.commit()
-            conn.close()
+            with self._lock:
+                self._conn.execute("""
+                    INSERT INTO documents (document_id, filename, upload_date, chunks_count, status, file_path, summary)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                """, (
+                    document_info["document_id"],
+                    document_info["filename"],
+                    document_info["upload_date"],
+                    document_info["chunks_count"],
+                    document_info["status"],
+                    document_info["file_path"],
+                    document_info.get("summary")
+                ))
             return True
         except Exception as e:
             print(f"Error adding document to database: {e}")
@@ -60,48 +74,58 @@ class DocumentDatabase:
     def get_all_documents(self) -> List[Dict[str, Any]]:
         """Get all documents from the database"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            conn.row_factory = sqlite3.Row
-            cursor = conn.cursor()
-            
-            cursor.execute("SELECT * FROM documents ORDER BY upload_date DESC")
-            rows = cursor.fetchall()
-            
-            documents = [dict(row) for row in rows]
-            conn.close()
-            return documents
+            rows = self._conn.execute(
+                "SELECT * FROM documents ORDER BY upload_date DESC"
+            ).fetchall()
+            return [dict(row) for row in rows]
         except Exception as e:
             print(f"Error fetching documents: {e}")
             return []
     
+    def get_documents_version(self) -> Tuple[int, str]:
+        """Get the document count and latest upload date, which change whenever the list does"""
+        try:
+            row = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(MAX(upload_date), '') FROM documents"
+            ).fetchone()
+            return row[0], row[1]
+        except Exception as e:
+            print(f"Error fetching documents version: {e}")
+            return 0, ""
+    
     def get_document(self, document_id: str) -> Optional[Dict[str, Any]]:
         """Get a specific document by ID"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            conn.row_factory = sqlite3.Row
-            cursor = conn.cursor()
-            
-            cursor.execute("SELECT * FROM documents WHERE document_id = ?", (document_id,))
-            row = cursor.fetchone()
-            
-            conn.close()
+            row = self._conn.execute(
+                "SELECT * FROM documents WHERE document_id = ?", (document_id,)
+            ).fetchone()
             return dict(row) if row else None
         except Exception as e:
             print(f"Error fetching document: {e}")
             return None
     
+    def get_summaries(self, document_ids: List[str]) -> List[Dict[str, Any]]:
+        """Get the stored summaries for the given documents, skipping those without one"""
+        if not document_ids:
+            return []
+        try:
+            placeholders = ", ".join("?" for _ in document_ids)
+            rows = self._conn.execute(
+                f"SELECT document_id, filename, summary FROM documents "
+                f"WHERE document_id IN ({placeholders}) AND summary IS NOT NULL AND summary != ''",
+                list(document_ids)
+            ).fetchall()
+            return [dict(row) for row in rows]
+        except Exception as e:
+            print(f"Error fetching document summaries: {e}")
+            return []
+    
     def delete_document(self, document_id: str) -> bool:
         """Delete a document from the database"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute("DELETE FROM documents WHERE document_id = ?", (document_id,))
-            deleted = cursor.rowcount > 0
-            
-            conn.commit()
-            conn.close()
-            return deleted
+            with self._lock:
+                cursor = self._conn.execute("DELETE FROM documents WHERE document_id = ?", (document_id,))
+                return cursor.rowcount > 0
         except Exception as e:
             print(f"Error deleting document from database: {e}")
             return False
@@ -109,3 +133,8 @@ class DocumentDatabase:
     def document_exists(self, document_id: str) -> bool:
         """Check if a document exists in the database"""
         return self.get_document(document_id) is not None
+    
+    def close(self):
+        """Close the shared connection"""
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,27 @@
+"""Shared service instances, created lazily once per process"""
+from functools import lru_cache
+
+from app.core.database import DocumentDatabase
+from app.services.ai_service import AIService
+from app.services.document_service import DocumentService
+from app.services.vector_service import VectorService
+
+
+@lru_cache()
+def get_ai_service() -> AIService:
+    return AIService()
+
+
+@lru_cache()
+def get_vector_service() -> VectorService:
+    return VectorService()
+
+
+@lru_cache()
+def get_document_service() -> DocumentService:
+    return DocumentService(vector_service=get_vector_service())
+
+
+@lru_cache()
+def get_database() -> DocumentDatabase:
+    return DocumentDatabase()
@@ -10,32 +10,46 @@ for _stream in (sys.stdout, sys.stderr):
     except (AttributeError, ValueError):
         pass
 
-from fastapi import FastAPI, File, UploadFile, HTTPException, Depends
+from contextlib import asynccontextmanager
+from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-import os
+import logging
 from dotenv import load_dotenv
 
 from app.api.routes import chat, documents
 from app.core.config import get_settings
-from app.services.ai_service import AIService
-from app.services.vector_service import VectorService
+from app.services.document_service import shutdown_extraction_pool
 
 # Load environment variables
 load_dotenv()
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Stop background worker processes on shutdown"""
+    yield
+    shutdown_extraction_pool()
+
 # Create FastAPI app
 app = FastAPI(
     title="RAG PDF Chatbot API",
     description="AI-powered document search and chat system",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    lifespan=lifespan
 )
 
 # Get settings
 settings = get_settings()
 
+# Configure logging for the app's own loggers only; a root handler would
+# also print every HTTP request the AI provider SDKs make through httpx
+_log_handler = logging.StreamHandler()
+_log_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+app_logger = logging.getLogger("app")
+app_logger.addHandler(_log_handler)
+app_logger.setLevel(settings.LOG_LEVEL)
+
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -45,10 +59,6 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize services
-ai_service = AIService()
-vector_service = VectorService()
-
 # Include routers
 app.include_router(chat.router, prefix="/api/v1/chat", tags=["chat"])
 app.include_router(documents.router, prefix="/api/v1/documents", tags=["documents"])
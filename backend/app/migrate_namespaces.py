@@ -0,0 +1,27 @@
+"""Move vectors indexed before per-document namespaces into them.
+
+Run once after upgrading, from the backend directory:
+
+    python -m app.migrate_namespaces
+
+Vectors of documents no longer in the database are deleted instead.
+"""
+import asyncio
+
+from app.core.database import DocumentDatabase
+from app.services.vector_service import VectorService
+
+
+async def main():
+    document_ids = {doc["document_id"] for doc in DocumentDatabase().get_all_documents()}
+    if not document_ids:
+        # Most likely run from the wrong directory, against a new empty database
+        print("❌ No documents found in documents.db. Run this from the backend directory.")
+        return
+    
+    moved, deleted = await VectorService().migrate_default_namespace(document_ids)
+    print(f"✅ Moved {moved} vectors into per-document namespaces, deleted {deleted} of removed documents")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 from typing import List, Optional, Dict, Any
 from datetime import datetime
 
@@ -9,6 +9,8 @@ class ChatRequest(BaseModel):
     conversation_id: Optional[str] = None
 
 class DocumentUploadResponse(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     document_id: str
     filename: str
     chunks_count: int
@@ -20,12 +22,17 @@ class ChatMessage(BaseModel):
     timestamp: datetime = Field(default_factory=datetime.now)
 
 class ChatResponse(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     response: str
     conversation_id: str
     sources: List[str] = []
     processing_time: Optional[float] = None
+    title: Optional[str] = None  # First message only, when CHAT_GENERATE_TITLES is set
 
 class DocumentInfo(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     document_id: str
     filename: str
     upload_date: datetime
@@ -34,15 +41,19 @@ class DocumentInfo(BaseModel):
 
 class SearchRequest(BaseModel):
     query: str = Field(..., min_length=1, max_length=500)
-    document_ids: Optional[List[str]] = Field(default_factory=list)
+    document_ids: List[str] = Field(..., min_length=1)
     top_k: int = Field(default=5, ge=1, le=20)
 
 class SearchResult(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     text: str
     score: float
     metadata: Dict[str, Any]
 
 class SearchResponse(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     results: List[SearchResult]
     query: str
     total_results: int
@@ -0,0 +1,23 @@
+"""PDF text extraction run in worker processes.
+
+Kept outside ``app.services`` and importing only PyMuPDF: worker processes
+import this module to unpickle the task, and importing the services package
+would load every AI and vector database SDK into each worker.
+"""
+from typing import List
+import pymupdf
+
+
+def count_pages(file_path: str) -> int:
+    with pymupdf.open(file_path) as doc:
+        return doc.page_count
+
+
+def extract_pages(file_path: str, start: int, stop: int) -> List[str]:
+    """Extract the text of pages [start, stop) with PyMuPDF.
+
+    Open documents can't be pickled, so each worker reopens the file and
+    works from page indices.
+    """
+    with pymupdf.open(file_path) as doc:
+        return [doc[i].get_text("text") for i in range(start, stop)]
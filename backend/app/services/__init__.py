@@ -3,5 +3,6 @@
 from .ai_service import AIService
 from .document_service import DocumentService
 from .vector_service import VectorService
+from .answer_cache import AnswerCache
 
-__all__ = ['AIService', 'DocumentService', 'VectorService']
\ No newline at end of file
+__all__ = ['AIService', 'DocumentService', 'VectorService', 'AnswerCache']
\ No newline at end of file
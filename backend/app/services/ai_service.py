@@ -1,14 +1,55 @@
 import os
 from google import genai
-from groq import Groq
-from typing import List, Dict, Any
+from groq import AsyncGroq
+from typing import List, Dict, Any, AsyncIterator
 from app.core.config import get_settings
 
+# Prompt templates, built once and filled in per request
+_SYSTEM_PROMPT = (
+    "System: You are a sophisticated AI document intelligence assistant. "
+    "Your primary role is to help users understand and extract information from their uploaded documents."
+)
+
+# The retrieved context chunks go between the head and the tail
+_CONTEXT_PROMPT_HEAD = _SYSTEM_PROMPT + "\n\nCRITICAL CONTEXT FROM UPLOADED DOCUMENT:\n"
+
+_CONTEXT_PROMPT_TAIL = (
+    "\n\n"
+    "INSTRUCTIONS: Use ONLY the provided context above to answer the user's question. "
+    "If the answer is not in the context, state that clearly but try to be helpful with what is available. "
+    "Maintain a professional and analytical tone."
+)
+
+_NO_CONTEXT_PROMPT = _SYSTEM_PROMPT + (
+    "\n\nNOTE: No specific document context was found for this query. "
+    "Answer to the best of your general knowledge, but remind the user to upload or select a document for specific analysis."
+)
+
+# A document was selected but nothing in it matched the query
+_NO_MATCH_PROMPT = _SYSTEM_PROMPT + (
+    "\n\nNOTE: No passage in the selected document matched this query. "
+    "Tell the user the document does not appear to cover it, answer from general knowledge if that helps, "
+    "and suggest rephrasing the question with terms used in the document."
+)
+
+# Answer for a blank question; the model is not called
+EMPTY_QUERY_RESPONSE = "Please enter a question."
+
+_SUMMARY_PROMPT = (
+    "Summarize the following document in a few paragraphs. Cover its purpose, "
+    "main topics and key facts, figures and conclusions so the summary can stand "
+    "in for the document when answering general questions about it.\n\n"
+    "DOCUMENT:\n"
+)
+
 class AIService:
     def __init__(self):
         self.settings = get_settings()
         self.client = None
         self.model_name = None
+        # Provider-specific completion methods, bound in setup_ai_client
+        self._generate = None
+        self._stream = None
         self.setup_ai_client()
     
     def setup_ai_client(self):
@@ -18,17 +59,58 @@ class AIService:
                 # Using the new google-genai SDK Client
                 self.client = genai.Client(api_key=self.settings.GEMINI_API_KEY)
                 self.model_name = 'gemini-2.0-flash'
+                self._generate = self._generate_gemini
+                self._stream = self._stream_gemini
                 print(f"✅ Gemini client initialized with model: {self.model_name}")
             elif self.settings.AI_PROVIDER == "groq":
-                self.client = Groq(api_key=self.settings.GROQ_API_KEY)
+                self.client = AsyncGroq(api_key=self.settings.GROQ_API_KEY)
                 # Updated to state-of-the-art supported model
                 self.model_name = 'llama-3.3-70b-versatile'
+                self._generate = self._generate_groq
+                self._stream = self._stream_groq
                 print(f"✅ Groq client initialized with model: {self.model_name}")
             else:
                 print(f"⚠️ Unknown AI provider: {self.settings.AI_PROVIDER}")
         except Exception as e:
             print(f"❌ Error setting up AI client: {str(e)}")
 
+    def _build_prompt(
+        self,
+        query: str,
+        context: List[str] = None,
+        conversation_history: List[Dict[str, str]] = None,
+        document_id: str = None
+    ) -> str:
+        """Assemble the full prompt for a chat turn"""
+        # Build the whole prompt in a single join so each context chunk is
+        # copied only once. System prompt has a stronger document focus.
+        # Context past MAX_CONTEXT_CHARS is cut off so a large retrieval
+        # can't overflow the model's context window.
+        if context:
+            prompt_parts = [_CONTEXT_PROMPT_HEAD]
+            remaining = self.settings.MAX_CONTEXT_CHARS
+            for i, chunk in enumerate(context):
+                if i:
+                    prompt_parts.append("\n\n")
+                prompt_parts.append(chunk[:remaining])
+                remaining -= len(chunk) + 2
+                if remaining <= 0:
+                    break
+            prompt_parts.append(_CONTEXT_PROMPT_TAIL)
+        elif document_id:
+            prompt_parts = [_NO_MATCH_PROMPT]
+        else:
+            prompt_parts = [_NO_CONTEXT_PROMPT]
+        
+        if conversation_history:
+            prompt_parts.append("\n\nConversation history:")
+            for msg in conversation_history[-5:]: # Last 5 messages for history
+                prompt_parts.extend(("\n\n", msg['role'].capitalize(), ": ", msg['content']))
+        
+        prompt_parts.extend(("\n\nUser: ", query, "\n\nAssistant:"))
+        
+        return "".join(prompt_parts)
+
     async def generate_response(
         self, 
         query: str, 
@@ -36,69 +118,112 @@ class AIService:
         conversation_history: List[Dict[str, str]] = None,
         document_id: str = None
     ) -> str:
-        """Generate AI response using Gemini or Groq"""
+        """Generate AI response using Gemini or Groq.
+
+        Provider errors are re-raised so callers never mistake (or cache) a
+        failure message for a real answer.
+        """
+        if not query or not query.strip():
+            return EMPTY_QUERY_RESPONSE
+        
         try:
             if not self.client:
-                return "AI Service is not properly initialized. Please check API keys."
+                raise RuntimeError("AI Service is not properly initialized. Please check API keys.")
 
-            # Construct system prompt with stronger document focus
-            system_prompt = (
-                "You are a sophisticated AI document intelligence assistant. "
-                "Your primary role is to help users understand and extract information from their uploaded documents."
-            )
-            
-            if context:
-                context_text = "\n\n".join(context)
-                system_prompt += (
-                    f"\n\nCRITICAL CONTEXT FROM UPLOADED DOCUMENT:\n{context_text}\n\n"
-                    "INSTRUCTIONS: Use ONLY the provided context above to answer the user's question. "
-                    "If the answer is not in the context, state that clearly but try to be helpful with what is available. "
-                    "Maintain a professional and analytical tone."
-                )
-            else:
-                system_prompt += (
-                    "\n\nNOTE: No specific document context was found for this query. "
-                    "Answer to the best of your general knowledge, but remind the user to upload or select a document for specific analysis."
-                )
-            
-            # Construct full prompt
-            prompt_parts = [f"System: {system_prompt}"]
-            
-            if conversation_history:
-                prompt_parts.append("Conversation history:")
-                for msg in conversation_history[-5:]: # Last 5 messages for history
-                    prompt_parts.append(f"{msg['role'].capitalize()}: {msg['content']}")
-            
-            prompt_parts.append(f"User: {query}")
-            prompt_parts.append("Assistant:")
-            
-            full_prompt = "\n\n".join(prompt_parts)
+            return await self._generate(self._build_prompt(query, context, conversation_history, document_id))
+        except Exception as e:
+            print(f"❌ Error generating AI response: {str(e)}")
+            raise
 
-            if self.settings.AI_PROVIDER == "gemini":
-                # New SDK syntax: client.models.generate_content
-                response = self.client.models.generate_content(
-                    model=self.model_name,
-                    contents=full_prompt
-                )
-                
-                # Defensive check for response text
-                if not response or not hasattr(response, 'text') or not response.text:
-                    print(f"⚠️ Gemini returned empty or invalid response. Response: {response}")
-                    return "I'm sorry, the AI was unable to generate a response. This could be due to safety filters or a temporary glitch."
-                    
-                return response.text
-            elif self.settings.AI_PROVIDER == "groq":
-                response = self.client.chat.completions.create(
-                    model=self.model_name,
-                    messages=[{"role": "user", "content": full_prompt}],
-                    temperature=0.3, # Lower temperature for better RAG groundedness
-                )
-                return response.choices[0].message.content
+    # Both providers are called through their async clients, so a request
+    # waiting on the model never blocks the event loop
+    async def _generate_gemini(self, prompt: str) -> str:
+        """Send a prompt to Gemini"""
+        # New SDK syntax: client.aio.models.generate_content
+        response = await self.client.aio.models.generate_content(
+            model=self.model_name,
+            contents=prompt
+        )
+        
+        # Defensive check for response text. Raise rather than return an
+        # apology so callers don't mistake (or cache) it for an answer.
+        if not response or not hasattr(response, 'text') or not response.text:
+            print(f"⚠️ Gemini returned empty or invalid response. Response: {response}")
+            raise RuntimeError("The AI returned an empty response. This could be due to safety filters or a temporary glitch.")
             
-            return "Error: AI Provider not configured correctly."
+        return response.text
+
+    async def _generate_groq(self, prompt: str) -> str:
+        """Send a prompt to Groq"""
+        response = await self.client.chat.completions.create(
+            model=self.model_name,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=0.3, # Lower temperature for better RAG groundedness
+        )
+        content = response.choices[0].message.content
+        if not content:
+            raise RuntimeError("The AI returned an empty response.")
+        return content
+
+    async def stream_response(
+        self, 
+        query: str, 
+        context: List[str] = None, 
+        conversation_history: List[Dict[str, str]] = None,
+        document_id: str = None
+    ) -> AsyncIterator[str]:
+        """Stream an AI response as it is generated, one text chunk at a time"""
+        if not query or not query.strip():
+            yield EMPTY_QUERY_RESPONSE
+            return
+        
+        try:
+            if not self.client:
+                raise RuntimeError("AI Service is not properly initialized. Please check API keys.")
+
+            prompt = self._build_prompt(query, context, conversation_history, document_id)
+            async for text in self._stream(prompt):
+                if text:
+                    yield text
         except Exception as e:
-            print(f"❌ Error generating AI response: {str(e)}")
-            return f"I'm sorry, I'm having trouble connecting to the AI service. (Error: {str(e)})"
+            print(f"❌ Error streaming AI response: {str(e)}")
+            raise
+
+    async def _stream_gemini(self, prompt: str) -> AsyncIterator[str]:
+        """Stream a completion from Gemini"""
+        stream = await self.client.aio.models.generate_content_stream(
+            model=self.model_name,
+            contents=prompt
+        )
+        async for chunk in stream:
+            yield chunk.text
+
+    async def _stream_groq(self, prompt: str) -> AsyncIterator[str]:
+        """Stream a completion from Groq"""
+        stream = await self.client.chat.completions.create(
+            model=self.model_name,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=0.3, # Lower temperature for better RAG groundedness
+            stream=True
+        )
+        async for chunk in stream:
+            if chunk.choices:
+                yield chunk.choices[0].delta.content
+
+    async def summarize_document(self, text: str) -> str:
+        """Summarize a document's text once, at upload time.
+
+        Returns an empty string on failure; the summary is an optional
+        fallback context and must not fail the upload.
+        """
+        try:
+            if not self.client or not text.strip():
+                return ""
+            summary = await self._generate(_SUMMARY_PROMPT + text)
+            return summary.strip()
+        except Exception as e:
+            print(f"⚠️ Error summarizing document: {str(e)}")
+            return ""
 
     async def get_embeddings(self, texts: List[str]) -> List[List[float]]:
         """Generate dense embeddings for a list of strings"""
@@ -107,8 +232,8 @@ class AIService:
                 # Fallback dummies for non-Gemini or uninitialized
                 return [[0.0] * 768 for _ in texts]
 
-            # New SDK syntax: client.models.embed_content
-            response = self.client.models.embed_content(
+            # New SDK syntax: client.aio.models.embed_content
+            response = await self.client.aio.models.embed_content(
                 model='text-embedding-004', 
                 contents=texts
             )
@@ -132,13 +257,13 @@ class AIService:
             prompt = f"Generate a short, descriptive title (max 6 words) for this question: {query}"
             
             if self.settings.AI_PROVIDER == "gemini":
-                response = self.client.models.generate_content(
+                response = await self.client.aio.models.generate_content(
                     model=self.model_name,
                     contents=prompt
                 )
                 return response.text.strip().strip('"')
             elif self.settings.AI_PROVIDER == "groq":
-                response = self.client.chat.completions.create(
+                response = await self.client.chat.completions.create(
                     model=self.model_name,
                     messages=[{"role": "user", "content": prompt}],
                     max_tokens=20
@@ -0,0 +1,48 @@
+"""Answer cache for repeated chat questions"""
+import re
+import time
+from typing import List, Dict, Any, Optional, Tuple
+from cachetools import TTLCache
+
+_WORD_RE = re.compile(r'\w+')
+
+
+def normalize_query(text: str) -> Tuple[str, ...]:
+    """Ordered, lowercased word sequence of a question, digits and short words included"""
+    return tuple(_WORD_RE.findall(text.lower()))
+
+
+class AnswerCache:
+    """In-process cache of chat answers for repeated questions.
+
+    An answer is reused only for the same question, after case and
+    punctuation are normalized away (see ``normalize_query``), asked against
+    the same set of documents. Near matches are deliberately not served:
+    "page 12" and "page 45", or "celsius to fahrenheit" and "fahrenheit to
+    celsius", need different answers. Entries expire after ``ttl`` seconds
+    and the least recently used entry is evicted once ``max_entries`` is
+    reached.
+    """
+
+    def __init__(self, ttl: int = 3600, max_entries: int = 1000, timer=time.monotonic):
+        self._entries = TTLCache(maxsize=max_entries, ttl=ttl, timer=timer)
+
+    @staticmethod
+    def make_key(document_ids: Optional[List[str]]) -> Tuple[str, ...]:
+        """Build the cache key for a set of document IDs"""
+        return tuple(sorted(document_ids or []))
+
+    def get(self, key: Tuple[str, ...], query: str) -> Optional[Dict[str, Any]]:
+        """Return the cached answer for the question, if there is one"""
+        return self._entries.get((key, normalize_query(query)))
+
+    def put(self, key: Tuple[str, ...], query: str, response: str, sources: List[str]):
+        """Store an answer for the given question"""
+        words = normalize_query(query)
+        if not words:
+            return
+        self._entries[(key, words)] = {"response": response, "sources": list(sources)}
+
+    def clear(self):
+        """Drop every cached entry"""
+        self._entries.clear()
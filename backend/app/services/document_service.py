@@ -1,20 +1,129 @@
 import os
+import re
 import uuid
-from typing import List, Dict, Any
+import asyncio
+import multiprocessing
+import aiofiles
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Dict, Any, Optional
 import PyPDF2
-import pdfplumber
 from fastapi import UploadFile
 from app.core.config import get_settings
+from app.pdf_extraction import count_pages, extract_pages
 from app.services.vector_service import VectorService
 
+# Uploads are copied to disk in pieces of this size
+UPLOAD_CHUNK_SIZE = 1 << 20  # 1MB
+
+# Chunking parameters
+PARAGRAPH_SEPARATOR = "\n\n"
+MIN_CHUNK_WORDS = 10  # Chunks with this many words or fewer are dropped
+
+_NON_SPACE_RE = re.compile(r'\S')
+_WORD_START_RE = re.compile(r'(?<!\S)\S')
+_SPACE_RE = re.compile(r'\s')
+_LAST_SPACE_RE = re.compile(r'.*\s', re.DOTALL)  # Greedy, so it stops at the last whitespace
+
+
+class FileTooLargeError(ValueError):
+    """Raised when an upload exceeds MAX_FILE_SIZE"""
+
+
+def _available_cpus() -> int:
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:  # Not available on macOS and Windows
+        return os.cpu_count() or 1
+
+
+# Worker processes for PDF text extraction, created on first use. They are
+# spawned rather than forked, since forking a multi-threaded server process
+# can copy locks held by other threads into the child.
+EXTRACTION_WORKERS = min(4, _available_cpus())
+POOL_MIN_PAGES = 32  # Smaller PDFs are extracted in-process, without the pool
+_extraction_pool: Optional[ProcessPoolExecutor] = None
+
+
+def _get_extraction_pool() -> ProcessPoolExecutor:
+    global _extraction_pool
+    if _extraction_pool is None:
+        _extraction_pool = ProcessPoolExecutor(
+            max_workers=EXTRACTION_WORKERS,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _extraction_pool
+
+
+def _discard_extraction_pool(pool: ProcessPoolExecutor):
+    """Drop a broken pool so the next extraction starts a fresh one"""
+    global _extraction_pool
+    if _extraction_pool is pool:
+        _extraction_pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def shutdown_extraction_pool():
+    """Stop the extraction worker processes, if they were started"""
+    global _extraction_pool
+    if _extraction_pool is not None:
+        _extraction_pool.shutdown()
+        _extraction_pool = None
+
+
+def _extract_text_pypdf2(file_path: str) -> str:
+    text_content = ""
+    with open(file_path, 'rb') as file:
+        pdf_reader = PyPDF2.PdfReader(file)
+        for page in pdf_reader.pages:
+            page_text = page.extract_text()
+            if page_text:
+                text_content += page_text + "\n\n"
+    return text_content
+
+
 class DocumentService:
-    def __init__(self):
+    def __init__(self, vector_service: Optional[VectorService] = None):
         self.settings = get_settings()
-        self.vector_service = VectorService()
+        # Pass the shared instance in; building a VectorService opens its own Pinecone client
+        self.vector_service = vector_service or VectorService()
+        
+        # Chunking state, resolved once instead of on every upload
+        self._chunk_size = self.settings.CHUNK_SIZE
+        # At most half a chunk is repeated, so every chunk moves the text on
+        self._chunk_overlap = max(0, min(self.settings.CHUNK_OVERLAP, self._chunk_size // 2))
         
         # Ensure upload directory exists
         os.makedirs(self.settings.UPLOAD_DIR, exist_ok=True)
     
+    async def save_upload(self, file: UploadFile, file_path: str) -> int:
+        """Stream an uploaded file to disk and return the number of bytes written.
+
+        The file is copied in UPLOAD_CHUNK_SIZE pieces to a temporary name and
+        renamed into place once complete, so a partial upload never appears
+        under ``file_path``. This is the single write path for uploads, so a
+        batched-I/O backend for bulk ingestion can be slotted in here.
+        """
+        tmp_path = file_path + ".tmp"
+        bytes_written = 0
+        
+        try:
+            async with aiofiles.open(tmp_path, "wb") as f:
+                while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                    bytes_written += len(chunk)
+                    if bytes_written > self.settings.MAX_FILE_SIZE:
+                        raise FileTooLargeError(
+                            f"File exceeds the maximum size of {self.settings.MAX_FILE_SIZE} bytes"
+                        )
+                    await f.write(chunk)
+            os.replace(tmp_path, file_path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        
+        return bytes_written
+    
     async def process_pdf(self, file: UploadFile) -> Dict[str, Any]:
         """Process uploaded PDF file"""
         try:
@@ -23,13 +132,10 @@ class DocumentService:
             
             # Save uploaded file
             file_path = os.path.join(self.settings.UPLOAD_DIR, f"{doc_id}_{file.filename}")
-            content = await file.read()
-            
-            with open(file_path, "wb") as f:
-                f.write(content)
+            await self.save_upload(file, file_path)
             
             # Extract text from PDF
-            text_content = self.extract_text_from_pdf(file_path)
+            text_content = await self.extract_text_from_pdf(file_path)
             
             if not text_content:
                 raise ValueError("Could not extract text from PDF")
@@ -64,32 +170,47 @@ class DocumentService:
         except Exception as e:
             raise ValueError(f"Error processing PDF: {str(e)}")
     
-    def extract_text_from_pdf(self, file_path: str) -> str:
-        """Extract text from PDF file using multiple methods"""
+    async def extract_text_from_pdf(self, file_path: str) -> str:
+        """Extract text from PDF file using multiple methods.
+
+        PDFs of POOL_MIN_PAGES pages or more are split into one contiguous
+        page range per worker and extracted in parallel in the process pool,
+        then joined back in page order. Smaller ones are extracted in a
+        thread, where the pool's overhead would outweigh the work.
+        """
         text_content = ""
+        pool = None
         
         try:
-            # Method 1: Try pdfplumber first (better for complex layouts)
-            with pdfplumber.open(file_path) as pdf:
-                for page in pdf.pages:
-                    page_text = page.extract_text()
-                    if page_text:
-                        text_content += page_text + "\n\n"
+            # Method 1: PyMuPDF, a fast C-backed text extractor
+            page_count = await asyncio.to_thread(count_pages, file_path)
+            if page_count < POOL_MIN_PAGES:
+                page_batches = [await asyncio.to_thread(extract_pages, file_path, 0, page_count)]
+            else:
+                pool = _get_extraction_pool()
+                loop = asyncio.get_running_loop()
+                step = max(1, -(-page_count // EXTRACTION_WORKERS))
+                page_batches = await asyncio.gather(*(
+                    loop.run_in_executor(pool, extract_pages, file_path, start, min(start + step, page_count))
+                    for start in range(0, page_count, step)
+                ))
+            text_content = "".join(
+                page_text + "\n\n" for batch in page_batches for page_text in batch if page_text
+            )
             
             if text_content.strip():
                 return text_content
             
+        except BrokenProcessPool:
+            # A worker died (e.g. crashed on a malformed PDF); replace the pool
+            print("⚠️ PDF extraction pool broke, restarting it")
+            _discard_extraction_pool(pool)
         except Exception:
             pass
         
         try:
             # Method 2: Fallback to PyPDF2
-            with open(file_path, 'rb') as file:
-                pdf_reader = PyPDF2.PdfReader(file)
-                for page in pdf_reader.pages:
-                    page_text = page.extract_text()
-                    if page_text:
-                        text_content += page_text + "\n\n"
+            text_content += await asyncio.to_thread(_extract_text_pypdf2, file_path)
             
         except Exception:
             pass
@@ -97,42 +218,54 @@ class DocumentService:
         return text_content.strip()
     
     def split_text_into_chunks(self, text: str) -> List[str]:
-        """Split text into smaller chunks for embedding"""
+        """Split text into smaller chunks for embedding.
+
+        Chunks are slices of the original text, found by offset in one pass:
+        each ends at the last paragraph break in the second half of the
+        CHUNK_SIZE window, or else at the last whitespace, so no chunk is
+        longer than CHUNK_SIZE unless a single word is. The next chunk starts
+        at the first word within CHUNK_OVERLAP characters of the end, and at
+        least CHUNK_SIZE - CHUNK_OVERLAP characters after the current start
+        (or at the end, for a chunk shorter than that).
+        """
         chunks = []
-        chunk_size = self.settings.CHUNK_SIZE
-        overlap = self.settings.CHUNK_OVERLAP
+        chunk_size = self._chunk_size
+        overlap = self._chunk_overlap
+        text_len = len(text)
         
-        # Simple text splitting by sentences and paragraphs
-        paragraphs = text.split('\n\n')
-        current_chunk = ""
+        match = _NON_SPACE_RE.search(text)
+        start = match.start() if match else text_len
         
-        for paragraph in paragraphs:
-            # If adding this paragraph would exceed chunk size
-            if len(current_chunk) + len(paragraph) > chunk_size:
-                if current_chunk:
-                    chunks.append(current_chunk.strip())
-                    
-                    # Start new chunk with overlap
-                    words = current_chunk.split()
-                    if len(words) > 50:  # Keep last 50 words for overlap
-                        overlap_text = ' '.join(words[-50:])
-                        current_chunk = overlap_text + "\n\n" + paragraph
-                    else:
-                        current_chunk = paragraph
-                else:
-                    current_chunk = paragraph
+        while start < text_len:
+            limit = start + chunk_size
+            if limit >= text_len:
+                end = text_len
             else:
-                if current_chunk:
-                    current_chunk += "\n\n" + paragraph
+                paragraph_end = text.rfind(PARAGRAPH_SEPARATOR, start, limit)
+                if paragraph_end > start + chunk_size // 2:
+                    end = paragraph_end
                 else:
-                    current_chunk = paragraph
-        
-        # Add the last chunk
-        if current_chunk:
-            chunks.append(current_chunk.strip())
-        
-        # Filter out very small chunks
-        chunks = [chunk for chunk in chunks if len(chunk.split()) > 10]
+                    match = _LAST_SPACE_RE.match(text, start, limit + 1)
+                    if match:
+                        end = match.end() - 1
+                    else:
+                        # A single word longer than the chunk size
+                        match = _SPACE_RE.search(text, limit)
+                        end = match.start() if match else text_len
+            
+            chunk = text[start:end].rstrip()
+            
+            # Filter out very small chunks, counting words only as far as needed
+            if len(chunk.split(None, MIN_CHUNK_WORDS)) > MIN_CHUNK_WORDS:
+                chunks.append(chunk)
+            
+            if end >= text_len:
+                break
+            
+            # Start the next chunk with overlap, on a word boundary
+            overlap_start = max(end - overlap, min(end, start + chunk_size - overlap))
+            match = _WORD_START_RE.search(text, overlap_start)
+            start = match.start() if match else text_len
         
         return chunks
     
@@ -157,7 +290,7 @@ class DocumentService:
             results = await self.vector_service.search_similar(
                 query=query,
                 top_k=5,
-                document_id=document_id
+                document_ids=[document_id] if document_id else None
             )
             
             # Extract text content from results
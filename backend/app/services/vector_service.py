@@ -1,11 +1,64 @@
 import os
+import asyncio
+import hashlib
+import heapq
 import numpy as np
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Set, Tuple
 from collections import Counter
+from itertools import chain
+from functools import lru_cache
 import re
+import diskcache
+import xxhash
 from pinecone import Pinecone, ServerlessSpec
 from app.core.config import get_settings
-from app.services.ai_service import AIService
+
+# Pinecone upsert batching
+UPSERT_BATCH_SIZE = 100
+UPSERT_MAX_RETRIES = 5  # Retries of a rate-limited (429) batch
+UPSERT_RETRY_DELAY = 0.5  # Seconds before the first retry, doubled each time
+
+# Namespaces queried at once when a search spans several documents
+QUERY_CONCURRENCY = 8
+
+# Size of the hashed sparse vocabulary
+SPARSE_DIMENSION = 1 << 17
+
+_TOKEN_RE = re.compile(r'\b\w+\b')
+_STOP_WORDS = frozenset({'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of', 'is', 'are', 'was', 'were'})
+
+# Number of recent query texts whose sparse vectors are kept
+QUERY_VECTOR_CACHE_SIZE = 2048
+
+def _sparse_vector(text: str) -> Tuple[Tuple[int, ...], Tuple[float, ...]]:
+    """Tokenize and hash text into sorted sparse (indices, values) tuples"""
+    tokens = [t for t in _TOKEN_RE.findall(text.lower()) if len(t) > 2 and t not in _STOP_WORDS]
+    token_counts = Counter(tokens)
+    if not token_counts:
+        return (), ()
+    
+    # Hash each distinct token once, then sum the counts of tokens that land
+    # in the same bucket. np.unique returns the buckets sorted. Raw counts
+    # are sent rather than dividing by chunk length, which would down-weight
+    # terms in longer chunks.
+    hashes = np.fromiter((xxhash.xxh64_intdigest(t.encode()) % SPARSE_DIMENSION for t in token_counts), dtype=np.int64, count=len(token_counts))
+    counts = np.fromiter(token_counts.values(), dtype=np.float64, count=len(token_counts))
+    indices, inverse = np.unique(hashes, return_inverse=True)
+    values = np.bincount(inverse, weights=counts)
+    
+    return tuple(indices.tolist()), tuple(values.tolist())
+
+# Queries repeat (follow-ups, "summarize this"); document chunks don't, so
+# only the query path goes through the cache
+_cached_sparse_vector = lru_cache(maxsize=QUERY_VECTOR_CACHE_SIZE)(_sparse_vector)
+
+# Identifies how _sparse_vector maps text to indices; part of every disk
+# cache key. Change it whenever tokenizing, hashing or weighting changes.
+SPARSE_SCHEME = f"xxh64-{SPARSE_DIMENSION}-v2"
+
+def _as_sparse_values(vector: Tuple[Tuple[int, ...], Tuple[float, ...]]) -> Dict[str, Any]:
+    indices, values = vector
+    return {"indices": list(indices), "values": list(values)}
 
 class VectorService:
     """Vector service optimized for Pinecone sparse-only indexes.
@@ -13,14 +66,17 @@ class VectorService:
     Notes:
     - Automatically handles the "Upserting dense vectors is not supported" constraint.
     - Uses empty values list [] by default for current index configuration.
+    - Each document's vectors live in their own namespace, named after the
+      document ID, so a search only touches the documents it asks for.
     """
 
     def __init__(self):
         self.settings = get_settings()
-        self.ai_service = AIService()
         self.pc = None
         self.index = None
         self.dimension = 1
+        # Sparse vectors of indexed chunks, keyed by content hash
+        self._vector_cache = diskcache.Cache(self.settings.CACHE_DIR)
         self.setup_vector_db()
 
     def setup_vector_db(self):
@@ -44,48 +100,63 @@ class VectorService:
             print(f"❌ Failed to connect to Pinecone: {str(e)}")
 
     def create_sparse_vector(self, text: str) -> Dict[str, Any]:
-        """Create sparse vector representation for text (BM25-style)"""
-        tokens = re.findall(r'\b\w+\b', text.lower())
-        stop_words = {'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of', 'is', 'are', 'was', 'were'}
-        tokens = [t for t in tokens if len(t) > 2 and t not in stop_words]
-        token_counts = Counter(tokens)
-        
-        index_value_map = {}
-        total_tokens = len(tokens)
-        
-        for token, count in token_counts.items():
-            token_hash = abs(hash(token)) % 100000
-            tf_value = float(count) / max(total_tokens, 1)
-            index_value_map[token_hash] = index_value_map.get(token_hash, 0.0) + tf_value
-        
-        sorted_items = sorted(index_value_map.items())
+        """Create sparse vector representation for text (BM25-style).
+
+        Used for queries; vectors for recently seen texts come from a cache.
+        """
+        return _as_sparse_values(_cached_sparse_vector(text))
+
+    def _chunk_sparse_vector(self, text: str) -> Tuple[Tuple[int, ...], Tuple[float, ...]]:
+        """Sparse vector for a document chunk, reused from the disk cache when the text was seen before"""
+        key = (SPARSE_SCHEME, hashlib.sha256(text.encode()).hexdigest())
+        vector = self._vector_cache.get(key)
+        if vector is None:
+            vector = _sparse_vector(text)
+            self._vector_cache.set(key, vector)
+        return vector
+
+    def _build_vector(self, text: str, meta: Dict[str, Any], i: int) -> Dict[str, Any]:
+        """Build the upsert record for one chunk"""
+        # OPTIMIZATION: We confirmed that the server requires an empty values list
+        # for this sparse-only index, regardless of the reported dimension of 1.
+        # Skipping the failed trial and going straight to empty list.
         return {
-            "indices": [idx for idx, _ in sorted_items],
-            "values": [val for _, val in sorted_items]
+            "id": f"{meta['document_id']}_{i}",
+            "values": [], 
+            "sparse_values": _as_sparse_values(self._chunk_sparse_vector(text)),
+            "metadata": meta
         }
 
     async def add_documents(self, texts: List[str], metadata: List[Dict[str, Any]]) -> bool:
-        """Add documents using sparse values only (with empty dense values)"""
+        """Add documents using sparse values only (with empty dense values).
+
+        Pass every chunk of a document in a single call: ``texts`` and
+        ``metadata`` are parallel lists, and the resulting vectors are
+        upserted in batches of UPSERT_BATCH_SIZE into each document's namespace.
+        """
         try:
-            vectors = []
-            for i, (text, meta) in enumerate(zip(texts, metadata)):
-                sparse_vec = self.create_sparse_vector(text)
-                
-                # OPTIMIZATION: We confirmed that the server requires an empty values list
-                # for this sparse-only index, regardless of the reported dimension of 1.
-                # Skipping the failed trial and going straight to empty list.
-                vectors.append({
-                    "id": f"{meta['document_id']}_{i}",
-                    "values": [], 
-                    "sparse_values": sparse_vec,
-                    "metadata": meta
-                })
+            # Tokenizing and cache lookups block, so build the records off the event loop
+            vectors = await asyncio.to_thread(
+                lambda: [self._build_vector(text, meta, i) for i, (text, meta) in enumerate(zip(texts, metadata))]
+            )
+
+            by_document: Dict[str, List[Dict[str, Any]]] = {}
+            for vector in vectors:
+                by_document.setdefault(vector["metadata"]["document_id"], []).append(vector)
 
-            # Upsert in batches
-            batch_size = 100
-            for i in range(0, len(vectors), batch_size):
-                batch = vectors[i : i + batch_size]
-                self.index.upsert(vectors=batch)
+            # Upsert in batches, running a few batches concurrently
+            batches = [
+                (document_id, doc_vectors[i : i + UPSERT_BATCH_SIZE])
+                for document_id, doc_vectors in by_document.items()
+                for i in range(0, len(doc_vectors), UPSERT_BATCH_SIZE)
+            ]
+            semaphore = asyncio.Semaphore(self.settings.PINECONE_UPSERT_CONCURRENCY)
+
+            async def upsert_batch(namespace: str, batch: List[Dict[str, Any]]):
+                async with semaphore:
+                    await self._upsert_with_retry(namespace, batch)
+
+            await asyncio.gather(*(upsert_batch(namespace, batch) for namespace, batch in batches))
 
             print(f"✅ Successfully added {len(vectors)} sparse vectors to Pinecone (using empty dense values)")
             return True
@@ -93,6 +164,20 @@ class VectorService:
             print(f"❌ Error adding documents to Pinecone: {e}")
             return False
 
+    async def _upsert_with_retry(self, namespace: str, batch: List[Dict[str, Any]]):
+        """Upsert one batch, backing off exponentially while Pinecone rate-limits"""
+        delay = UPSERT_RETRY_DELAY
+        for attempt in range(UPSERT_MAX_RETRIES + 1):
+            try:
+                await asyncio.to_thread(self.index.upsert, vectors=batch, namespace=namespace)
+                return
+            except Exception as e:
+                if getattr(e, "status", None) != 429 or attempt == UPSERT_MAX_RETRIES:
+                    raise
+                print(f"⚠️ Pinecone rate limit hit, retrying upsert in {delay:.1f}s")
+                await asyncio.sleep(delay)
+                delay *= 2
+
     async def search_similar(self, query: str, top_k: int = 5, document_ids: List[str] = None) -> List[Dict[str, Any]]:
         """Search similar chunks using sparse vector"""
         try:
@@ -104,26 +189,26 @@ class VectorService:
                 print(f"⚠️ Search query '{query}' yielded an empty sparse vector. Skipping search.")
                 return []
             
-            # Prepare filter
-            filter_dict = {}
-            if document_ids:
-                if len(document_ids) == 1:
-                    filter_dict["document_id"] = document_ids[0]
-                else:
-                    # Pinecone supports '$in' for matching multiple values
-                    filter_dict["document_id"] = {"$in": document_ids}
+            # Searches are scoped to documents; querying every namespace
+            # would cost one round trip per indexed document
+            if not document_ids:
+                print("⚠️ Search without document IDs. Skipping search.")
+                return []
             
-            # For query, we also provide empty vector for the dense part
-            resp = self.index.query(
-                vector=[],
-                sparse_vector=query_sparse,
-                top_k=top_k,
-                filter=filter_dict if filter_dict else None,
-                include_metadata=True
-            )
+            # Query each document's namespace concurrently and keep the best
+            # matches overall
+            namespaces = document_ids
+            semaphore = asyncio.Semaphore(QUERY_CONCURRENCY)
+
+            async def query_namespace(namespace: str) -> List[Dict[str, Any]]:
+                async with semaphore:
+                    return await self._query_namespace(namespace, query_sparse, top_k)
+
+            batches = await asyncio.gather(*(query_namespace(namespace) for namespace in namespaces))
+            matches = heapq.nlargest(top_k, chain.from_iterable(batches), key=lambda m: m.get("score", 0.0))
 
             results: List[Dict[str, Any]] = []
-            for m in resp.get("matches", []):
+            for m in matches:
                 meta = m.get("metadata", {})
                 results.append({
                     "text": meta.get("chunk_text") or meta.get("text") or "",
@@ -135,10 +220,84 @@ class VectorService:
             print(f"❌ Error searching Pinecone: {e}")
             return []
 
+    async def _query_namespace(self, namespace: str, sparse_vector: Dict[str, Any], top_k: int) -> List[Dict[str, Any]]:
+        """Run one sparse query against a single namespace"""
+        # For query, we also provide empty vector for the dense part.
+        # The Pinecone client is blocking, so run it off the event loop.
+        resp = await asyncio.to_thread(
+            self.index.query,
+            vector=[],
+            sparse_vector=sparse_vector,
+            top_k=top_k,
+            namespace=namespace,
+            include_metadata=True
+        )
+        return resp.get("matches", [])
+
+    async def migrate_default_namespace(self, document_ids: Set[str]) -> Tuple[int, int]:
+        """Move vectors indexed before per-document namespaces into them.
+
+        Every vector in the default namespace that belongs to one of
+        ``document_ids`` is re-hashed from the chunk text in its metadata with
+        the current sparse scheme, upserted into its document's namespace
+        under the same ID, then deleted from the default namespace. Vectors
+        of any other (already deleted) document are just deleted. Vectors
+        without a document ID or chunk text are left alone. Returns the
+        number of vectors moved and deleted; safe to re-run.
+        """
+        moved = 0
+        deleted = 0
+        pages = await asyncio.to_thread(lambda: list(self.index.list(namespace="")))
+        for ids in pages:
+            resp = await asyncio.to_thread(self.index.fetch, ids=list(ids), namespace="")
+
+            chunks = []
+            orphans = []
+            for vector_id, vector in resp.vectors.items():
+                meta = dict(vector.metadata or {})
+                text = meta.get("chunk_text") or meta.get("text")
+                if not meta.get("document_id") or not text:
+                    print(f"⚠️ Skipping vector {vector_id}: no document_id or chunk text in metadata")
+                    continue
+                if meta["document_id"] not in document_ids:
+                    orphans.append(vector_id)
+                    continue
+                chunks.append((vector_id, text, meta))
+
+            if orphans:
+                await asyncio.to_thread(self.index.delete, ids=orphans, namespace="")
+                deleted += len(orphans)
+
+            # Re-hashing blocks, so build the page's records off the event loop
+            records = await asyncio.to_thread(lambda: [
+                {
+                    "id": vector_id,
+                    "values": [],
+                    "sparse_values": _as_sparse_values(self._chunk_sparse_vector(text)),
+                    "metadata": meta
+                }
+                for vector_id, text, meta in chunks
+            ])
+            by_document: Dict[str, List[Dict[str, Any]]] = {}
+            for record in records:
+                by_document.setdefault(record["metadata"]["document_id"], []).append(record)
+
+            for document_id, vectors in by_document.items():
+                await self._upsert_with_retry(document_id, vectors)
+                await asyncio.to_thread(self.index.delete, ids=[v["id"] for v in vectors], namespace="")
+                moved += len(vectors)
+
+        return moved, deleted
+
     async def delete_document(self, document_id: str) -> bool:
         """Delete document vectors"""
         try:
-            self.index.delete(filter={"document_id": document_id})
+            try:
+                await asyncio.to_thread(self.index.delete, delete_all=True, namespace=document_id)
+            except Exception as e:
+                # Documents indexed before per-document namespaces have none
+                if getattr(e, "status", None) != 404:
+                    raise
             return True
         except Exception as e:
             print(f"❌ Error deleting document: {e}")
@@ -0,0 +1,86 @@
+"""Tests for the chat answer cache"""
+import pytest
+
+from app.services.answer_cache import AnswerCache, normalize_query
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def put(cache, question, answer, document_ids=("doc-1",)):
+    key = AnswerCache.make_key(list(document_ids))
+    cache.put(key, question, answer, ["doc.pdf: Chunk 0"])
+
+
+def get(cache, question, document_ids=("doc-1",)):
+    key = AnswerCache.make_key(list(document_ids))
+    return cache.get(key, question)
+
+
+def test_normalize_query_keeps_order_digits_and_short_words():
+    assert normalize_query("What is on Page 12?") == ("what", "is", "on", "page", "12")
+
+
+def test_repeated_question_hits():
+    cache = AnswerCache()
+    put(cache, "What is the main conclusion?", "answer")
+    cached = get(cache, "what is the MAIN conclusion")
+    assert cached["response"] == "answer"
+    assert cached["sources"] == ["doc.pdf: Chunk 0"]
+
+
+@pytest.mark.parametrize("stored, asked", [
+    ("What is on page 12?", "What is on page 45?"),
+    ("Summarize chapter 3", "Summarize chapter 7"),
+    ("Summarize section 2.1", "Summarize section 4.3"),
+    ("Convert celsius to fahrenheit", "Convert fahrenheit to celsius"),
+    ("What is the main conclusion?", "What is the main conclusion of chapter 2?"),
+])
+def test_different_questions_miss(stored, asked):
+    cache = AnswerCache()
+    put(cache, stored, "answer")
+    assert get(cache, asked) is None
+
+
+def test_entries_are_scoped_to_the_document_set():
+    cache = AnswerCache()
+    put(cache, "What is the main conclusion?", "answer", document_ids=("a", "b"))
+    assert get(cache, "What is the main conclusion?", document_ids=("b", "a"))["response"] == "answer"
+    assert get(cache, "What is the main conclusion?", document_ids=("a",)) is None
+
+
+def test_entries_expire_after_ttl():
+    clock = FakeClock()
+    cache = AnswerCache(ttl=60, timer=clock)
+    put(cache, "What is the main conclusion?", "answer")
+    clock.now += 61
+    assert get(cache, "What is the main conclusion?") is None
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = AnswerCache(max_entries=2)
+    put(cache, "first question", "1")
+    put(cache, "second question", "2")
+    assert get(cache, "first question") is not None
+    put(cache, "third question", "3")
+    assert get(cache, "second question") is None
+    assert get(cache, "first question")["response"] == "1"
+    assert get(cache, "third question")["response"] == "3"
+
+
+def test_questions_without_words_are_not_cached():
+    cache = AnswerCache()
+    put(cache, "???", "answer")
+    assert get(cache, "???") is None
+
+
+def test_clear_drops_everything():
+    cache = AnswerCache()
+    put(cache, "What is the main conclusion?", "answer")
+    cache.clear()
+    assert get(cache, "What is the main conclusion?") is None
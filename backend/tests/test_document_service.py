@@ -0,0 +1,98 @@
+"""Tests for DocumentService text chunking"""
+import random
+
+import pytest
+
+from app.core.config import Settings
+from app.services import document_service as document_service_module
+from app.services.document_service import DocumentService, MIN_CHUNK_WORDS
+
+
+def make_service(monkeypatch, tmp_path, chunk_size, chunk_overlap):
+    settings = Settings(UPLOAD_DIR=str(tmp_path), CHUNK_SIZE=chunk_size, CHUNK_OVERLAP=chunk_overlap)
+    monkeypatch.setattr(document_service_module, "get_settings", lambda: settings)
+    # Chunking never touches the vector store
+    return DocumentService(vector_service=object())
+
+
+def make_text(paragraphs=200, seed=0):
+    """PDF-like text: paragraphs of words of varying length"""
+    rng = random.Random(seed)
+    vocabulary = ["the", "of", "vector", "document", "retrieval", "a", "chunk", "overlap",
+                  "embedding", "is", "pinecone", "search", "summary", "page", "12", "results"]
+    return "\n\n".join(
+        " ".join(rng.choice(vocabulary) for _ in range(rng.randint(20, 120)))
+        for _ in range(paragraphs)
+    )
+
+
+def chunk_offsets(text, chunks):
+    """Locate each chunk in the text, checking it is a slice of it"""
+    offsets = []
+    position = 0
+    for chunk in chunks:
+        start = text.find(chunk, position)
+        assert start >= 0
+        offsets.append((start, start + len(chunk)))
+        position = start + 1
+    return offsets
+
+
+@pytest.mark.parametrize("chunk_size, chunk_overlap", [(1000, 200), (500, 200), (360, 200), (300, 200), (150, 200)])
+def test_chunks_fit_overlap_and_cover_the_text(monkeypatch, tmp_path, chunk_size, chunk_overlap):
+    service = make_service(monkeypatch, tmp_path, chunk_size, chunk_overlap)
+    text = make_text()
+    chunks = service.split_text_into_chunks(text)
+    offsets = chunk_offsets(text, chunks)
+    overlap = min(chunk_overlap, chunk_size // 2)
+
+    assert all(len(chunk) <= chunk_size for chunk in chunks)
+    assert all(chunk == chunk.strip() for chunk in chunks)
+    # Chunks start on word boundaries
+    assert all(start == 0 or text[start - 1].isspace() for start, _ in offsets)
+
+    for (start, end), (next_start, _) in zip(offsets, offsets[1:]):
+        # Only a dropped tail of a few words can fall between chunks, and the
+        # overlap stays bounded
+        assert len(text[end:next_start].split()) <= MIN_CHUNK_WORDS
+        assert end - next_start <= overlap
+        # Each chunk moves the text on by at least CHUNK_SIZE - CHUNK_OVERLAP,
+        # unless it was cut short at a paragraph break
+        assert next_start - start >= min(end - start, chunk_size - overlap)
+
+    # Total duplication is bounded by the overlap ratio
+    assert sum(len(chunk) for chunk in chunks) <= len(text) * chunk_size / (chunk_size - overlap)
+
+
+def test_full_chunks_overlap(monkeypatch, tmp_path):
+    service = make_service(monkeypatch, tmp_path, 500, 100)
+    text = " ".join(f"word{i}" for i in range(500))
+    offsets = chunk_offsets(text, service.split_text_into_chunks(text))
+
+    assert len(offsets) > 1
+    for (_, end), (next_start, _) in zip(offsets, offsets[1:]):
+        assert 0 < end - next_start <= 100
+
+
+def test_chunks_end_at_paragraph_breaks(monkeypatch, tmp_path):
+    service = make_service(monkeypatch, tmp_path, 1000, 200)
+    first = " ".join(["alpha"] * 120)  # 719 characters
+    second = " ".join(["beta"] * 120)
+    chunks = service.split_text_into_chunks(first + "\n\n" + second)
+
+    assert chunks[0] == first
+    assert chunks[1] == second
+
+
+def test_zero_overlap(monkeypatch, tmp_path):
+    service = make_service(monkeypatch, tmp_path, 200, 0)
+    text = make_text(paragraphs=20)
+    chunks = service.split_text_into_chunks(text)
+
+    assert " ".join(chunks).split() == text.split()
+
+
+def test_short_chunks_are_dropped(monkeypatch, tmp_path):
+    service = make_service(monkeypatch, tmp_path, 1000, 200)
+    assert service.split_text_into_chunks("  too few words here  ") == []
+    assert service.split_text_into_chunks("") == []